@@ -1,15 +1,13 @@
 import streamlit as st
 import hashlib
 import uuid
-from PIL import Image
 from streamlit_autorefresh import st_autorefresh
 from supabase import create_client, Client
 from io import BytesIO
-import numpy as np
 import time
+import threading
 from collections import Counter
 from datetime import datetime
-import pandas as pd
 
 # --- KONFIGURASI APLIKASI ---
 try:
@@ -19,12 +17,19 @@ try:
 except (KeyError, AttributeError):
     st.error("Kesalahan: Kunci Supabase tidak ditemukan. Harap tambahkan ke .streamlit/secrets.toml dan di pengaturan Streamlit Cloud.")
     st.stop()
+# "poll": st_autorefresh tiap 7 detik. "supabase": push dari Supabase Realtime.
+# "local": push dari broker di proses ini (untuk tes dan deploy satu proses).
+NOTIFY_MODE_SETTING = st.secrets.get("NOTIFY_MODE", "poll")
+NOTIFY_MODE = NOTIFY_MODE_SETTING if NOTIFY_MODE_SETTING in ("poll", "supabase", "local") else "poll"
+REALTIME_GRACE_SECONDS = 30
 
 # --- FUNGSI HELPER & CRUD ---
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def upload_image_to_storage(file_uploader_object, bucket_name):
+    # Pillow hanya dimuat saat ada upload, bukan di setiap run halaman login/beranda.
+    from PIL import Image
     try:
         file_bytes = file_uploader_object.getvalue()
         unique_filename = f"{uuid.uuid4().hex}.jpg"
@@ -43,7 +48,8 @@ def upload_payment_proof(transaction_id, uploaded_file):
     with st.status("Mengunggah bukti pembayaran..."):
         proof_url = upload_image_to_storage(uploaded_file, "product-images") 
     if proof_url:
-        supabase.table("transactions").update({"payment_proof_url": proof_url, "status": "Diproses"}).eq("id", transaction_id).execute()
+        updated = supabase.table("transactions").update({"payment_proof_url": proof_url, "status": "Diproses"}).eq("id", transaction_id).execute().data
+        mark_transaction_changed(transaction_id); publish_local_change("transactions", updated)
         st.success("Bukti pembayaran berhasil diunggah!")
         st.session_state.pop('pending_payment', None)
         if f"proof_direct_{transaction_id}" in st.session_state: del st.session_state[f"proof_direct_{transaction_id}"]
@@ -53,6 +59,8 @@ def upload_payment_proof(transaction_id, uploaded_file):
 
 @st.cache_data(ttl=300)
 def to_excel(data: list) -> bytes:
+    # pandas (dan openpyxl) hanya dimuat saat admin membuka menu unduh data.
+    import pandas as pd
     df = pd.DataFrame(data)
     for col in df.columns:
         if data and not df[col].empty and isinstance(df[col].iloc[0], (dict, list)):
@@ -113,7 +121,9 @@ def delete_product(product_id):
 # --- Fungsi CRUD untuk Transaksi ---
 def add_transaction(username, game_name, paket, harga, user_nickname, user_game_id, status="Menunggu"):
     trans_data = {"username": username, "game": game_name, "paket": paket, "harga": harga, "user_nickname": user_nickname, "user_game_id": user_game_id, "status": status}
-    return supabase.table("transactions").insert(trans_data).execute().data[0]
+    new_transaction = supabase.table("transactions").insert(trans_data).execute().data[0]
+    mark_transaction_changed(new_transaction['id']); publish_local_change("transactions", [new_transaction])
+    return new_transaction
 def get_user_transactions(username):
     return supabase.table("transactions").select("*").eq("username", username).order("waktu", desc=True).execute().data
 def get_all_transactions():
@@ -124,7 +134,111 @@ def update_transaction_status(trans_id, status, reason=None):
         update_data['failure_reason'] = reason
     else:
         update_data['failure_reason'] = None
-    supabase.table("transactions").update(update_data).eq("id", trans_id).execute()
+    updated = supabase.table("transactions").update(update_data).eq("id", trans_id).execute().data
+    mark_transaction_changed(trans_id); publish_local_change("transactions", updated)
+
+# --- Fungsi Analitik Penjualan ---
+# Agregat disimpan per (hari, game, paket, metode, status, alasan) dan diperbarui
+# secara inkremental: hanya baris dengan id > last_id yang diambil, ditambah baris
+# yang statusnya diubah sejak agregasi terakhir (kontribusi lamanya dikurangi dulu).
+# Perubahan status diketahui dari aplikasi ini sendiri dan, pada NOTIFY_MODE
+# "supabase", dari event UPDATE/DELETE Realtime. Di mode lain, perubahan dari replika
+# lain atau dashboard Supabase baru terlihat setelah "Hitung Ulang Semua".
+ANALYTICS_COLUMNS = "id, waktu, game, paket, harga, user_nickname, status, failure_reason"
+ANALYTICS_KEYS = ["hari", "game", "paket", "metode", "status", "alasan"]
+
+def get_transactions_after(last_id, page_size=1000):
+    rows = []
+    while True:
+        batch = supabase.table("transactions").select(ANALYTICS_COLUMNS).gt("id", last_id).order("id").limit(page_size).execute().data
+        rows.extend(batch)
+        if len(batch) < page_size: return rows
+        last_id = batch[-1]['id']
+def get_transactions_by_ids(trans_ids):
+    return supabase.table("transactions").select(ANALYTICS_COLUMNS).in_("id", list(trans_ids)).execute().data
+
+@st.cache_resource
+def get_sales_analytics_state():
+    # "lock" hanya untuk menukar rows/cube; "changed_lock" menjaga changed_ids (id -> jumlah
+    # perubahan), sehingga update status dan listener realtime tidak menunggu query analitik.
+    return {"lock": threading.Lock(), "changed_lock": threading.Lock(), "version": 0,
+            "last_id": 0, "rows": None, "cube": None, "changed_ids": Counter()}
+
+def mark_transaction_changed(trans_id):
+    state = get_sales_analytics_state()
+    with state["changed_lock"]: state["changed_ids"][trans_id] += 1
+
+def to_analytics_frame(rows):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=[c.strip() for c in ANALYTICS_COLUMNS.split(",")]).set_index("id")
+    return pd.DataFrame({
+        "hari": df["waktu"].astype(str).str.slice(0, 10),
+        "game": df["game"].fillna("N/A"),
+        "paket": df["paket"].fillna("N/A"),
+        "metode": df["user_nickname"].fillna("").str.split("|", n=1).str[1].fillna("-"),
+        "status": df["status"].fillna("N/A"),
+        "alasan": df["failure_reason"].where(df["status"] == "Gagal").fillna("-"),
+        "harga": pd.to_numeric(df["harga"], errors="coerce").fillna(0),
+    }, index=df.index)
+
+def merge_sales_cube(cube, frame, sign=1):
+    if frame.empty: return cube
+    delta = frame.groupby(ANALYTICS_KEYS).agg(pesanan=("harga", "size"), pendapatan=("harga", "sum")) * sign
+    if cube is None: return delta
+    merged = cube.add(delta, fill_value=0)
+    return merged[merged["pesanan"] > 0]
+
+def refresh_sales_analytics(full=False):
+    import pandas as pd
+    state = get_sales_analytics_state()
+    with state["lock"]:
+        version = state["version"]
+        rows, cube, last_id = (None, None, 0) if full else (state["rows"], state["cube"], state["last_id"])
+    with state["changed_lock"]: pending = Counter(state["changed_ids"])
+    # Query Supabase berjalan tanpa lock. Id <= last_id diambil ulang per id, termasuk
+    # yang belum ada di rows (insert yang commit tidak urut id).
+    refetch = [i for i in pending if i <= last_id]
+    if refetch:
+        current = to_analytics_frame(get_transactions_by_ids(refetch))
+        known = [i for i in refetch if i in rows.index]
+        if known:
+            cube = merge_sales_cube(cube, rows.loc[known], sign=-1); rows = rows.drop(known)
+        cube = merge_sales_cube(cube, current)
+        rows = pd.concat([rows, current])
+    new_rows = get_transactions_after(last_id)
+    if new_rows:
+        new = to_analytics_frame(new_rows)
+        cube = merge_sales_cube(cube, new)
+        rows = new if rows is None else pd.concat([rows, new])
+        last_id = int(new.index.max())
+    with state["lock"]:
+        if state["version"] != version:
+            # Refresh lain sudah menyimpan hasil yang lebih baru; hasil ini dibuang.
+            return None if state["cube"] is None else state["cube"].copy()
+        state.update(rows=rows, cube=cube, last_id=last_id, version=version + 1)
+    # Id dihapus dari changed_ids hanya jika sudah diproses dan tidak berubah lagi sejak snapshot.
+    done = [i for i in pending if i in refetch or (rows is not None and i in rows.index)]
+    with state["changed_lock"]:
+        for i in done:
+            if state["changed_ids"][i] == pending[i]: del state["changed_ids"][i]
+    return None if cube is None else cube.copy()
+
+def summarize_sales(cube, by):
+    import pandas as pd
+    flat = cube.reset_index()
+    orders = flat.groupby(by)["pesanan"].sum()
+    revenue = flat[flat["status"] == "Selesai"].groupby(by)["pendapatan"].sum()
+    failed = flat[flat["status"] == "Gagal"].groupby(by)["pesanan"].sum()
+    summary = pd.DataFrame({"Pesanan": orders, "Pendapatan (Rp)": revenue, "Gagal": failed}).fillna(0).astype(int)
+    summary["Tingkat Gagal (%)"] = (summary["Gagal"] / summary["Pesanan"] * 100).round(1)
+    return summary.sort_values("Pendapatan (Rp)", ascending=False)
+
+def summarize_failures(cube):
+    flat = cube.reset_index()
+    total_orders = flat["pesanan"].sum()
+    failed = flat[flat["status"] == "Gagal"].groupby("alasan")["pesanan"].sum().astype(int).to_frame("Gagal")
+    failed["Tingkat Gagal (%)"] = (failed["Gagal"] / total_orders * 100).round(1) if total_orders else 0.0
+    return failed.sort_values("Gagal", ascending=False)
 
 # --- Fungsi CRUD untuk Ulasan ---
 def add_review(game_id, username, rating, comment):
@@ -143,7 +257,9 @@ def delete_review(review_id):
 def send_message(sender, recipient, content):
     if content:
         message_data = {"sender": sender, "recipient": recipient, "content": content}
-        return supabase.table("messages").insert(message_data).execute()
+        response = supabase.table("messages").insert(message_data).execute()
+        publish_local_change("messages", response.data)
+        return response
 def get_conversation(user1, user2):
     response1 = supabase.table("messages").select("*").eq("sender", user1).eq("recipient", user2).execute().data
     response2 = supabase.table("messages").select("*").eq("sender", user2).eq("recipient", user1).execute().data
@@ -163,11 +279,96 @@ def get_conversations_for_admin():
     sorted_users = sorted(conversations_summary.keys(), key=lambda u: conversations_summary[u]['last_message_time'], reverse=True)
     return conversations_summary, sorted_users
 def mark_messages_as_read(recipient, sender):
-    supabase.table("messages").update({"is_read": True}).eq("recipient", recipient).eq("sender", sender).execute()
+    # Hanya pesan yang belum dibaca, agar tidak memicu event realtime di setiap render.
+    supabase.table("messages").update({"is_read": True}).eq("recipient", recipient).eq("sender", sender).eq("is_read", False).execute()
+
+# --- NOTIFIKASI PUSH (REALTIME) ---
+# Setiap perubahan menaikkan versi topik "transactions" (admin) dan "user:<username>"
+# (pemilik pesanan / peserta chat). Session hanya rerun jika versi topiknya berubah.
+class ChangeBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = Counter()
+    def publish(self, topics):
+        with self._lock:
+            for topic in topics: self._versions[topic] += 1
+    def version(self, topics):
+        with self._lock: return sum(self._versions[topic] for topic in topics)
+
+@st.cache_resource
+def get_change_broker():
+    return ChangeBroker()
+
+def publish_change(table, record):
+    if table == "transactions":
+        topics = ["transactions", f"user:{record.get('username')}"]
+    else:
+        topics = [f"user:{record.get('sender')}", f"user:{record.get('recipient')}"]
+    get_change_broker().publish(topics)
+
+def publish_local_change(table, records):
+    if NOTIFY_MODE != "local": return
+    for record in records or []: publish_change(table, record)
+
+def handle_realtime_change(table, payload):
+    data = payload.get("data", {})
+    # realtime==2.4.3 memanggil setiap binding "*" untuk semua event; abaikan event tabel lain.
+    if data.get("table") != table: return
+    record = data.get("record") or data.get("old_record") or {}
+    if table == "transactions" and record.get("id") is not None: mark_transaction_changed(record["id"])
+    publish_change(table, record)
+
+@st.cache_resource
+def start_realtime_listener():
+    import asyncio
+    from realtime import AsyncRealtimeClient
+    subscribed = threading.Event()
+    async def listen():
+        client = AsyncRealtimeClient(f"{SUPABASE_URL}/realtime/v1", SUPABASE_KEY)
+        try:
+            await client.connect()
+            channel = client.channel("arra-changes")
+            for table in ("transactions", "messages"):
+                channel.on_postgres_changes("*", callback=lambda payload, table=table: handle_realtime_change(table, payload), table=table)
+            await channel.subscribe()
+            # `subscribed` hanya aktif selama channel tersambung. Jika tidak sehat lebih lama
+            # dari REALTIME_GRACE_SECONDS (auto-reconnect gagal), thread berhenti dan
+            # realtime_ready() membuat listener baru.
+            last_healthy = time.monotonic()
+            while time.monotonic() - last_healthy < REALTIME_GRACE_SECONDS:
+                # _listen_task selesai berarti websocket sudah tertutup (realtime==2.4.3).
+                listening = client.is_connected and client._listen_task is not None and not client._listen_task.done()
+                if listening and channel.is_joined:
+                    subscribed.set(); last_healthy = time.monotonic()
+                else: subscribed.clear()
+                await asyncio.sleep(0.5)
+        finally:
+            subscribed.clear()
+            await client.close()
+    listener = threading.Thread(target=lambda: asyncio.run(listen()), name="supabase-realtime", daemon=True)
+    listener.start()
+    return {"thread": listener, "subscribed": subscribed}
+
+def realtime_ready():
+    listener = start_realtime_listener()
+    if not listener["thread"].is_alive(): start_realtime_listener.clear()
+    return listener["subscribed"].is_set()
+
+def session_change_topics():
+    if st.session_state["role"] == "admin": return ["transactions", "user:admin"]
+    return [f"user:{st.session_state['user']}"]
+
+@st.fragment(run_every=1)
+def watch_changes():
+    # Hanya membaca versi di memori; rerun penuh (dan query database) hanya jika ada perubahan,
+    # atau jika koneksi realtime terputus sehingga main() perlu kembali ke st_autorefresh.
+    if NOTIFY_MODE == "supabase" and not realtime_ready(): st.rerun(scope="app")
+    if get_change_broker().version(session_change_topics()) != st.session_state.get("seen_change_version"):
+        st.rerun(scope="app")
 
 # --- MANAJEMEN SESSION STATE ---
 def clear_session():
-    keys_to_clear = ["user", "role", "user_selected_game", "selected_product", "last_statuses", "pending_payment", "editing_game_id", "editing_product_id", "show_review_form", "visible_reviews_count", "selected_chat_user", "confirming_delete_user"]
+    keys_to_clear = ["user", "role", "user_selected_game", "selected_product", "last_statuses", "pending_payment", "editing_game_id", "editing_product_id", "show_review_form", "visible_reviews_count", "selected_chat_user", "confirming_delete_user", "seen_change_version"]
     for key in keys_to_clear:
         if key in st.session_state: del st.session_state[key]
 
@@ -220,7 +421,7 @@ def login_register_menu():
 def admin_page():
     st.sidebar.title("✨ ARRA")
     st.sidebar.header("👑 ADMIN PANEL")
-    sub_menu = st.sidebar.radio("Menu", ["📊 Laporan & Unduh Data", "🧾 Daftar Transaksi", "🛍️ Kelola Produk", "🎮 Kelola Game", "📝 Kelola Ulasan", "💬 Kotak Pesan", "👥 Kelola User"])
+    sub_menu = st.sidebar.radio("Menu", ["📊 Laporan & Unduh Data", "📈 Analitik Penjualan", "🧾 Daftar Transaksi", "🛍️ Kelola Produk", "🎮 Kelola Game", "📝 Kelola Ulasan", "💬 Kotak Pesan", "👥 Kelola User"])
     if st.sidebar.button("Logout", use_container_width=True): clear_session(); st.rerun()
     st.header(f"{sub_menu}")
     st.divider()
@@ -261,6 +462,34 @@ def admin_page():
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
             else: st.info("Belum ada data produk untuk diunduh.")
 
+    elif sub_menu == "📈 Analitik Penjualan":
+        col1, col2 = st.columns([4, 1.5])
+        with col1:
+            st.write("Ringkasan pendapatan (pesanan Selesai), jumlah pesanan, dan tingkat kegagalan.")
+            if NOTIFY_MODE != "supabase": st.caption("Perubahan status dari luar aplikasi ini (replika lain/dashboard) baru terhitung setelah 'Hitung Ulang Semua'.")
+        with col2: full_refresh = st.button("🔄 Hitung Ulang Semua", use_container_width=True)
+        with st.spinner("Memperbarui analitik..."):
+            cube = refresh_sales_analytics(full=full_refresh)
+        if cube is None: st.info("Belum ada data transaksi untuk dianalisis."); return
+        by_day = summarize_sales(cube, "hari").sort_index()
+        total_orders = int(by_day["Pesanan"].sum()); total_failed = int(by_day["Gagal"].sum())
+        col1, col2, col3 = st.columns(3)
+        with col1: st.metric("Total Pendapatan", f"Rp {int(by_day['Pendapatan (Rp)'].sum()):,}")
+        with col2: st.metric("Total Pesanan", f"{total_orders} Pesanan")
+        with col3: st.metric("Tingkat Gagal", f"{total_failed / total_orders * 100:.1f}%" if total_orders else "0%")
+        with st.container(border=True):
+            st.subheader("Pendapatan per Hari")
+            st.bar_chart(by_day["Pendapatan (Rp)"])
+            st.dataframe(by_day.sort_index(ascending=False), use_container_width=True)
+        game_tab, paket_tab, metode_tab, gagal_tab = st.tabs(["🎮 Per Game", "🛍️ Per Paket", "💳 Per Metode Bayar", "❗ Alasan Gagal"])
+        with game_tab: st.dataframe(summarize_sales(cube, "game"), use_container_width=True)
+        with paket_tab: st.dataframe(summarize_sales(cube, ["game", "paket"]), use_container_width=True)
+        with metode_tab: st.dataframe(summarize_sales(cube, "metode"), use_container_width=True)
+        with gagal_tab:
+            failures = summarize_failures(cube)
+            if failures.empty: st.info("Belum ada transaksi yang gagal.")
+            else: st.dataframe(failures, use_container_width=True)
+
     elif sub_menu == "👥 Kelola User":
         st.write("Cari, lihat, dan hapus pengguna dari sistem.")
         search_user = st.text_input("🔍 Cari username pengguna...")
@@ -659,7 +888,7 @@ def user_page():
             if not game_reviews: st.info("Jadilah yang pertama memberikan ulasan untuk game ini!")
             else:
                 ratings_list = [r['rating'] for r in game_reviews]
-                avg_rating = np.mean(ratings_list) if ratings_list else 0
+                avg_rating = sum(ratings_list) / len(ratings_list) if ratings_list else 0
                 st.markdown(f"**Rating Rata-rata:** {'⭐' * int(round(avg_rating))} ({avg_rating:.1f} / 5 dari {len(ratings_list)} ulasan)")
                 st.divider()
                 if 'visible_reviews_count' not in st.session_state: st.session_state.visible_reviews_count = 3
@@ -703,10 +932,16 @@ def user_page():
 # --- LOGIKA UTAMA APLIKASI ---
 def main():
     st.set_page_config(page_title="ARRA TopUp", page_icon="✨", layout="wide", initial_sidebar_state="expanded")
+    if NOTIFY_MODE != NOTIFY_MODE_SETTING:
+        st.warning(f"NOTIFY_MODE '{NOTIFY_MODE_SETTING}' tidak dikenal (pilihan: poll, supabase, local). Memakai mode 'poll'.")
     if "user" not in st.session_state:
         login_register_menu()
     else:
-        st_autorefresh(interval=7000, key="global_refresh")
+        if NOTIFY_MODE == "poll" or (NOTIFY_MODE == "supabase" and not realtime_ready()):
+            st_autorefresh(interval=7000, key="global_refresh")
+        else:
+            st.session_state.seen_change_version = get_change_broker().version(session_change_topics())
+            watch_changes()
         st.sidebar.title("✨ ARRA")
         st.sidebar.success(f"Login sebagai: **{st.session_state['user']}**")
         st.sidebar.caption(f"Role: {st.session_state['role']}")
@@ -0,0 +1,86 @@
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class SessionState(dict):
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.filters, self.action, self.values, self.sort, self.max_rows = [], "select", None, None, None
+
+    def select(self, *args): return self
+    def eq(self, col, val): self.filters.append(lambda r: r.get(col) == val); return self
+    def gt(self, col, val): self.filters.append(lambda r: r.get(col) > val); return self
+    def in_(self, col, vals): self.filters.append(lambda r: r.get(col) in vals); return self
+    def order(self, col, desc=False): self.sort = (col, desc); return self
+    def limit(self, n): self.max_rows = n; return self
+    def insert(self, values): self.action, self.values = "insert", values; return self
+    def update(self, values): self.action, self.values = "update", values; return self
+    def delete(self): self.action = "delete"; return self
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.action == "insert":
+            row = {"id": max([r["id"] for r in rows], default=0) + 1, **self.values}
+            rows.append(row)
+            return types.SimpleNamespace(data=[dict(row)])
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.action == "update":
+            for r in matched: r.update(self.values)
+        elif self.action == "delete":
+            self.db.tables[self.table] = [r for r in rows if r not in matched]
+        if self.sort: matched = sorted(matched, key=lambda r: r[self.sort[0]], reverse=self.sort[1])
+        if self.max_rows is not None: matched = matched[:self.max_rows]
+        return types.SimpleNamespace(data=[dict(r) for r in matched])
+
+
+class FakeSupabase:
+    def __init__(self): self.tables = {}
+    def table(self, name): return FakeQuery(self, name)
+
+
+def cache_resource(func):
+    box = {}
+    def wrapper():
+        if "value" not in box: box["value"] = func()
+        return box["value"]
+    wrapper.clear = box.clear
+    return wrapper
+
+
+def install_stubs():
+    st = types.ModuleType("streamlit")
+    st.secrets = {"SUPABASE_URL": "http://localhost", "SUPABASE_KEY": "test-key"}
+    st.session_state = SessionState()
+    st.cache_resource = cache_resource
+    st.cache_data = lambda **kwargs: (lambda func: func)
+    st.fragment = lambda **kwargs: (lambda func: func)
+    st.error = st.warning = st.stop = lambda *args, **kwargs: None
+    autorefresh = types.ModuleType("streamlit_autorefresh")
+    autorefresh.st_autorefresh = lambda **kwargs: None
+    supabase = types.ModuleType("supabase")
+    supabase.Client = FakeSupabase
+    supabase.create_client = lambda url, key: FakeSupabase()
+    sys.modules.update({"streamlit": st, "streamlit_autorefresh": autorefresh, "supabase": supabase})
+
+
+@pytest.fixture
+def app(monkeypatch):
+    install_stubs()
+    module = importlib.import_module("TESTING")
+    monkeypatch.setattr(module, "supabase", FakeSupabase())
+    monkeypatch.setattr(module, "NOTIFY_MODE", "poll")
+    module.get_change_broker.clear()
+    module.get_sales_analytics_state.clear()
+    module.st.session_state.clear()
+    return module
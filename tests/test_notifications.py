@@ -0,0 +1,67 @@
+def login(app, username, role="user"):
+    app.st.session_state.update(user=username, role=role)
+    return app.session_change_topics()
+
+
+def versions(app):
+    broker = app.get_change_broker()
+    return {name: broker.version(login(app, name, role)) for name, role in [("budi", "user"), ("sari", "user"), ("admin", "admin")]}
+
+
+def test_transaction_change_reaches_owner_and_admin(app):
+    before = versions(app)
+    app.publish_change("transactions", {"id": 1, "username": "budi"})
+    after = versions(app)
+    assert after["budi"] == before["budi"] + 1
+    assert after["admin"] == before["admin"] + 1
+    assert after["sari"] == before["sari"]
+
+
+def test_message_reaches_both_participants(app):
+    before = versions(app)
+    app.publish_change("messages", {"id": 1, "sender": "sari", "recipient": "admin"})
+    after = versions(app)
+    assert after["sari"] == before["sari"] + 1
+    assert after["admin"] == before["admin"] + 1
+    assert after["budi"] == before["budi"]
+
+
+def test_admin_session_watches_all_transactions_and_admin_chat(app):
+    assert login(app, "owner", role="admin") == ["transactions", "user:admin"]
+    assert login(app, "budi") == ["user:budi"]
+
+
+def test_realtime_event_is_ignored_by_binding_of_other_table(app):
+    payload = {"ids": [1], "data": {"type": "INSERT", "table": "messages", "record": {"id": 7, "sender": "budi", "recipient": "admin"}}}
+    before = versions(app)
+    app.handle_realtime_change("transactions", payload)
+    assert versions(app) == before
+    assert 7 not in app.get_sales_analytics_state()["changed_ids"]
+    app.handle_realtime_change("messages", payload)
+    assert versions(app)["budi"] == before["budi"] + 1
+
+
+def test_realtime_transaction_update_marks_analytics_and_notifies_owner(app):
+    payload = {"ids": [0], "data": {"type": "UPDATE", "table": "transactions", "record": {"id": 3, "username": "sari"}}}
+    before = versions(app)
+    app.handle_realtime_change("transactions", payload)
+    assert versions(app)["sari"] == before["sari"] + 1
+    assert 3 in app.get_sales_analytics_state()["changed_ids"]
+
+
+def test_local_mode_publishes_own_writes(app, monkeypatch):
+    monkeypatch.setattr(app, "NOTIFY_MODE", "local")
+    before = versions(app)
+    trans = app.add_transaction("budi", "Game", "100 Diamonds", 10000, "budi|DANA", "123")
+    app.update_transaction_status(trans["id"], "Selesai")
+    app.send_message("admin", "budi", "Pesanan selesai")
+    after = versions(app)
+    assert after["budi"] == before["budi"] + 3
+    assert after["admin"] == before["admin"] + 3
+    assert after["sari"] == before["sari"]
+
+
+def test_poll_mode_does_not_publish(app):
+    before = versions(app)
+    app.add_transaction("budi", "Game", "100 Diamonds", 10000, "budi|DANA", "123")
+    assert versions(app) == before
@@ -0,0 +1,83 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+def seed(app, count):
+    for i in range(count):
+        status = ["Menunggu", "Diproses", "Selesai", "Gagal"][i % 4]
+        app.supabase.table("transactions").insert({
+            "waktu": f"2025-06-0{1 + i % 3}T10:00:00+00:00", "username": f"user{i % 5}", "game": "AB"[i % 2],
+            "paket": f"p{i % 3}", "harga": 1000 * (1 + i % 4), "user_nickname": ["n|DANA", "n|GOPAY", None][i % 3],
+            "user_game_id": "1", "status": status, "failure_reason": "Stok habis" if status == "Gagal" else None,
+        }).execute()
+
+
+def assert_matches_full_recompute(app, incremental):
+    full = app.refresh_sales_analytics(full=True)
+    pd.testing.assert_frame_equal(incremental.sort_index(), full.sort_index(), check_dtype=False)
+
+
+def test_incremental_matches_full_after_status_changes_and_deletes(app):
+    seed(app, 40)
+    app.refresh_sales_analytics()
+    for trans_id in (1, 2, 6, 13):
+        app.update_transaction_status(trans_id, "Gagal", "ID salah")
+    app.update_transaction_status(4, "Selesai")
+    app.supabase.table("transactions").delete().eq("id", 9).execute(); app.mark_transaction_changed(9)
+    seed(app, 5)
+    assert_matches_full_recompute(app, app.refresh_sales_analytics())
+
+
+def test_out_of_order_insert_behind_watermark_is_counted(app):
+    seed(app, 3)
+    rows = app.supabase.tables["transactions"]
+    late = rows.pop(1)
+    app.refresh_sales_analytics()
+    assert app.get_sales_analytics_state()["last_id"] == 3
+    rows.append(late); app.mark_transaction_changed(late["id"])
+    cube = app.refresh_sales_analytics()
+    assert int(cube["pesanan"].sum()) == 3
+    assert_matches_full_recompute(app, cube)
+
+
+def test_failed_refresh_keeps_pending_changes(app, monkeypatch):
+    seed(app, 8)
+    app.refresh_sales_analytics()
+    app.update_transaction_status(1, "Selesai")
+    def fail(last_id): raise ConnectionError("supabase down")
+    with monkeypatch.context() as patch:
+        patch.setattr(app, "get_transactions_after", fail)
+        with pytest.raises(ConnectionError):
+            app.refresh_sales_analytics()
+    assert 1 in app.get_sales_analytics_state()["changed_ids"]
+    assert_matches_full_recompute(app, app.refresh_sales_analytics())
+
+
+def test_change_during_refresh_is_kept_for_next_refresh(app, monkeypatch):
+    seed(app, 8)
+    app.refresh_sales_analytics()
+    app.update_transaction_status(2, "Selesai")
+    fetch_after = app.get_transactions_after
+    def change_while_fetching(last_id):
+        app.update_transaction_status(2, "Gagal", "Dibatalkan")
+        return fetch_after(last_id)
+    with monkeypatch.context() as patch:
+        patch.setattr(app, "get_transactions_after", change_while_fetching)
+        app.refresh_sales_analytics()
+    assert 2 in app.get_sales_analytics_state()["changed_ids"]
+    assert_matches_full_recompute(app, app.refresh_sales_analytics())
+
+
+def test_summaries_count_revenue_only_for_completed_orders(app):
+    for status, method, price in [("Selesai", "n|DANA", 5000), ("Gagal", "n|DANA", 7000), ("Selesai", "n|GOPAY", 3000), ("Menunggu", None, 1000)]:
+        app.supabase.table("transactions").insert({"waktu": "2025-06-01T10:00:00", "game": "A", "paket": "p", "harga": price,
+            "user_nickname": method, "status": status, "failure_reason": "Stok habis" if status == "Gagal" else None}).execute()
+    cube = app.refresh_sales_analytics()
+    by_method = app.summarize_sales(cube, "metode")
+    assert by_method.loc["DANA", "Pendapatan (Rp)"] == 5000
+    assert by_method.loc["DANA", "Pesanan"] == 2
+    assert by_method.loc["-", "Pesanan"] == 1
+    failures = app.summarize_failures(cube)
+    assert failures.loc["Stok habis", "Gagal"] == 1
+    assert failures.loc["Stok habis", "Tingkat Gagal (%)"] == 25.0